@@ -16,34 +16,53 @@ Author: AI Fitness Team
 Version: 1.0.0
 """
 
+import asyncio
 import sys
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
 # FastAPI and server components
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
 
+try:
+    import orjson  # noqa: F401 - required by ORJSONResponse when rendering
+    ResponseClass = ORJSONResponse
+except ImportError:
+    ResponseClass = JSONResponse
+
 # Add project root to path for imports
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 # Import our modules
 from model.nl_parser import parse_natural_language_input
-from model.predict_sets import predict as predict_sets
-from model.expert_rules import substitute_exercises, refine_predictions
+from model.predict_sets import predict as predict_sets, flatten_predictions, warm_up as warm_up_predictor
+from model.expert_rules import substitute_exercises, refine_predictions, warm_up as warm_up_rules
 from model.llm_planner import call_llm_for_plan
 
+@asynccontextmanager
+async def lifespan(app):
+    # Runs once per worker process, so each worker loads the model and exercise data before serving
+    await asyncio.to_thread(warm_up_rules)
+    await asyncio.to_thread(warm_up_predictor)
+    yield
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Fitness Planner",
     description="Intelligent workout planning through natural language processing and ML",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ResponseClass,
+    lifespan=lifespan
 )
 
 # CORS middleware for web app integration
@@ -62,11 +81,15 @@ class FitnessRequest(BaseModel):
     use_natural_language: Optional[bool] = True
 
 
+class ParseRequest(BaseModel):
+    message: str = ""
+
+
 class FitnessResponse(BaseModel):
     plan: str
     profile: dict
     source: str
-    structured_data: Optional[dict] = None
+    structured_data: Optional[list] = None
 
 
 @app.get("/")
@@ -92,32 +115,27 @@ async def create_fitness_plan(request: FitnessRequest):
     }
     """
     try:
+        # Blocking stages run in worker threads so the event loop keeps serving requests
         # Step 1: Parse natural language input
-        profile = parse_natural_language_input(request.message)
+        profile = await asyncio.to_thread(parse_natural_language_input, request.message)
         
         # Step 2: Get ML model predictions
-        raw_preds = predict_sets(profile)
+        raw_preds = await asyncio.to_thread(predict_sets, profile)
         
         # Step 3: Transform predictions to expert rules format
-        preds = {}
-        for muscle_group, exercises in raw_preds.items():
-            for exercise_data in exercises:
-                exercise_name = exercise_data['exercise']
-                params = exercise_data['parameters']
-                preds[exercise_name] = {
-                    'sets': params['sets'],
-                    'reps': params['reps'], 
-                    'intensity': params['intensity']
-                }
+        preds = flatten_predictions(raw_preds)
         
         # Step 4: Apply expert rules and substitutions
         equipment = profile.get('Equipment', 'Gym')
         injuries = profile.get('Injuries', [])
-        preds = substitute_exercises(preds, equipment, injuries)
+        preds = await asyncio.to_thread(substitute_exercises, preds, equipment, injuries)
         preds = refine_predictions(preds, profile)
         
         # Step 5: Generate plan with LLM or fallback
-        result = call_llm_for_plan(profile, preds, weeks=request.weeks, natural_language=request.use_natural_language)
+        result = await asyncio.to_thread(
+            call_llm_for_plan, profile, preds,
+            weeks=request.weeks, natural_language=request.use_natural_language
+        )
         
         # Step 6: Format response
         if request.use_natural_language and 'explanation' in result:
@@ -126,30 +144,32 @@ async def create_fitness_plan(request: FitnessRequest):
             # Format structured data as readable text
             plan_text = _format_structured_plan(result['weeks'], profile, request.weeks)
         
-        return FitnessResponse(
-            plan=plan_text,
-            profile=profile,
-            source=result.get('source', 'unknown'),
-            structured_data=result['weeks'] if not request.use_natural_language else None
-        )
+        # Returned as a ready response: FitnessResponse documents the shape, but the
+        # (potentially large) plan is serialized once instead of validated and re-encoded
+        return ResponseClass({
+            "plan": plan_text,
+            "profile": profile,
+            "source": result.get('source', 'unknown'),
+            "structured_data": result['weeks'] if not request.use_natural_language else None
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating plan: {str(e)}")
 
 
 @app.post("/parse")
-async def parse_message(request: dict):
+async def parse_message(request: ParseRequest):
     """
     Parse natural language input into structured profile data.
     
     Example: {"message": "25 year old female, wants to lose weight, 3 days per week"}
     """
     try:
-        message = request.get('message', '')
+        message = request.message
         if not message:
             raise HTTPException(status_code=400, detail="Message is required")
         
-        profile = parse_natural_language_input(message)
+        profile = await asyncio.to_thread(parse_natural_language_input, message)
         return {"profile": profile}
         
     except Exception as e:
@@ -163,28 +183,37 @@ def _format_structured_plan(weeks_data, profile, num_weeks):
     goal = profile.get('Goal', 'fitness')
     days = profile.get('Days_per_Week', 4)
     
-    plan = f"Personalized {num_weeks}-week workout plan for {age}-year-old {gender.lower()}\n"
-    plan += f"Goal: {goal} | Training Days: {days} per week\n\n"
+    parts = [
+        f"Personalized {num_weeks}-week workout plan for {age}-year-old {gender.lower()}\n",
+        f"Goal: {goal} | Training Days: {days} per week\n\n",
+    ]
     
     for week_num, week_data in enumerate(weeks_data[:num_weeks], 1):
-        plan += f"Week {week_num}:\n"
+        parts.append(f"Week {week_num}:\n")
         for day, exercises in week_data.items():
             if exercises:
-                plan += f"  Day {day}: "
-                exercise_list = []
-                for ex_name, params in exercises:
-                    sets = params.get('sets', 3)
-                    reps = params.get('reps', 10)
-                    exercise_list.append(f"{ex_name} ({sets}x{reps})")
-                plan += ", ".join(exercise_list) + "\n"
+                exercise_list = ", ".join(
+                    f"{ex_name} ({params.get('sets', 3)}x{params.get('reps', 10)})"
+                    for ex_name, params in exercises
+                )
+                parts.append(f"  Day {day}: {exercise_list}\n")
             else:
-                plan += f"  Day {day}: Rest\n"
-        plan += "\n"
+                parts.append(f"  Day {day}: Rest\n")
+        parts.append("\n")
     
-    return plan
+    return "".join(parts)
 
 
 if __name__ == "__main__":
     print("Starting AI Fitness Planner server...")
     print("API docs available at: http://localhost:8000/docs")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop/httptools come with uvicorn[standard]; one worker process per CPU core
+    uvicorn.run(
+        "api_server:app",
+        app_dir=str(project_root),
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=os.cpu_count() or 1
+    )
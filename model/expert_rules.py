@@ -6,22 +6,90 @@ This is a core production module that provides:
 - Multi-week progression planning
 - Smart exercise scheduling (push/pull/legs splits)
 """
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from types import MappingProxyType
 import os
 import json
+import mmap
+import re
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the kernels are plain NumPy and run unjitted
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; unmatched names fall back to a scan
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json parser is used without it
+    orjson = None
+
+
+# Split type indexed by training days (clamped to 0-7)
+_SPLIT_TABLE = (
+    "full_body", "full_body", "full_body", "full_body_plus",
+    "upper_lower", "push_pull_legs_plus", "push_pull_legs", "push_pull_legs",
+)
 
 
 def choose_split(days, goal):
     # Return a split type string based on days and goal
-    if days <= 2:
-        return "full_body"
-    if days == 3:
-        return "full_body_plus"
-    if days == 4:
-        return "upper_lower"
-    if days == 5:
-        return "push_pull_legs_plus"
-    return "push_pull_legs"
+    return _SPLIT_TABLE[max(0, min(int(days), 7))]
+
+
+# Simple muscle group mapping for our canonical exercises and safe weekly set caps
+_MUSCLE_MAP = MappingProxyType({
+    'Bench': 'chest', 'OverheadPress': 'shoulders', 'Row': 'back',
+    'Squat': 'legs', 'Deadlift': 'posterior_chain'
+})
+_WEEKLY_CAP = MappingProxyType({'legs': 25, 'chest': 20, 'back': 20, 'shoulders': 15, 'posterior_chain': 20})
+
+# Weekly set caps indexed by muscle group id; unmapped exercises fall into 'other'
+_MUSCLE_IDS = MappingProxyType({'chest': 0, 'shoulders': 1, 'back': 2, 'legs': 3, 'posterior_chain': 4, 'other': 5})
+_CAPS = np.array([_WEEKLY_CAP.get(mg, 30) for mg in _MUSCLE_IDS], dtype=np.int64)
+_OTHER_ID = _MUSCLE_IDS['other']
+_EXERCISE_MUSCLE_IDS = MappingProxyType({ex: _MUSCLE_IDS[mg] for ex, mg in _MUSCLE_MAP.items()})
+_GOAL_CODES = {'Strength': 1, 'Endurance': 2, 'Muscle Gain': 3}
+
+
+@njit(cache=True)
+def _refine(sets, reps, intensity, mg_idx, caps, goal_code):
+    # Goal adjustments followed by proportional scaling of muscle groups over their cap.
+    # Sets/reps are int64, intensity is float64 (fallback parameters may be fractional).
+    if goal_code == 1:
+        intensity = np.minimum(10.0, intensity + 1.0)
+        reps = np.maximum(3, reps - 1)
+    elif goal_code == 2:
+        reps = reps + 2
+        intensity = np.maximum(1.0, intensity - 1.0)
+    elif goal_code == 3:
+        # small bump in sets for hypertrophy
+        sets = np.rint(sets * 1.05).astype(np.int64)
+
+    totals = np.bincount(mg_idx, weights=sets.astype(np.float64), minlength=caps.shape[0])
+    exceeded = totals > caps
+    # 'other' is tallied but never scaled down
+    exceeded[_OTHER_ID] = False
+    if not exceeded.any():
+        return sets, reps, intensity
+
+    scale = caps / np.maximum(totals, 1.0)
+    scaled = np.maximum(1.0, np.rint(sets * scale[mg_idx])).astype(np.int64)
+    sets = np.where(exceeded[mg_idx], scaled, sets)
+    return sets, reps, intensity
+
+
+def _as_number(x):
+    x = float(x)
+    return int(x) if x.is_integer() else x
 
 
 def refine_predictions(preds, profile):
@@ -32,44 +100,34 @@ def refine_predictions(preds, profile):
     # - Cap weekly sets per muscle group to a safe limit (e.g., 20)
     goal = profile.get('Goal', '')
     days = profile.get('Days_per_Week', 4)
+    if not preds:
+        return preds
 
-    # Adjustments
-    for ex, v in preds.items():
-        if goal == 'Strength':
-            v['intensity'] = min(10, v['intensity'] + 1)
-            v['reps'] = max(3, v['reps'] - 1)
-        elif goal == 'Endurance':
-            v['reps'] = v['reps'] + 2
-            v['intensity'] = max(1, v['intensity'] - 1)
-        elif goal == 'Muscle Gain':
-            # small bump in sets for hypertrophy
-            v['sets'] = int(round(v['sets'] * 1.05))
-
-    # Safety caps: simple muscle group mapping and weekly set cap
-    muscle_map = {
-        'Bench': 'chest', 'OverheadPress': 'shoulders', 'Row': 'back',
-        'Squat': 'legs', 'Deadlift': 'posterior_chain'
-    }
-    weekly_cap = {'legs': 25, 'chest': 20, 'back': 20, 'shoulders': 15, 'posterior_chain': 20}
-
-    # Compute weekly total sets per muscle
-    weekly_sets = defaultdict(int)
-    for ex, v in preds.items():
-        mg = muscle_map.get(ex, 'other')
-        weekly_sets[mg] += v['sets']
-
-    # If over cap, scale down proportionally
-    for mg, total in list(weekly_sets.items()):
-        cap = weekly_cap.get(mg, 30)
-        if total > cap:
-            scale = cap / total
-            for ex, v in preds.items():
-                if muscle_map.get(ex) == mg:
-                    v['sets'] = max(1, int(round(v['sets'] * scale)))
+    # Pack predictions into parallel arrays for the numeric kernel
+    values = list(preds.values())
+    n = len(values)
+    sets = np.fromiter((v['sets'] for v in values), np.int64, n)
+    reps = np.fromiter((v['reps'] for v in values), np.int64, n)
+    intensity = np.fromiter((v['intensity'] for v in values), np.float64, n)
+    mg_idx = np.fromiter((_EXERCISE_MUSCLE_IDS.get(ex, _OTHER_ID) for ex in preds), np.int64, n)
+
+    sets, reps, intensity = _refine(sets, reps, intensity, mg_idx, _CAPS, _GOAL_CODES.get(goal, 0))
+
+    for i, v in enumerate(values):
+        v['sets'] = int(sets[i])
+        v['reps'] = int(reps[i])
+        v['intensity'] = _as_number(intensity[i])
 
     return preds
 
 
+# Exercise name keywords per category (lowercase); an exercise may match several
+_PUSH_RE = re.compile(r'press|push|dip|handstand')
+_PULL_RE = re.compile(r'row|pull|curl')
+_LEGS_RE = re.compile(r'squat|deadlift|leg|femoral|hamstring')
+_STRETCH_RE = re.compile(r'stretch')
+
+
 def schedule_exercises(preds, days):
     # Better scheduler: distribute exercises across week with proper spacing
     exercises = list(preds.keys())
@@ -100,18 +158,22 @@ def schedule_exercises(preds, days):
     # Clear the schedule and only use training days
     schedule = {d: [] for d in range(1, 8)}
     
-    # Categorize exercises by type for better distribution
-    push = {'Bench','OverheadPress', 'bench press', 'overhead press', 'push', 'press', 'dip', 'handstand'}
-    pull = {'Row', 'row', 'pull', 'curl'}
-    legs = {'Squat','Deadlift', 'squat', 'deadlift', 'leg', 'femoral', 'hamstring'}
-    stretch = {'stretch', 'runners stretch', 'hamstring stretch'}
-    
-    # Categorize all exercises
-    push_exercises = [ex for ex in exercises if any(p in ex.lower() for p in push)]
-    pull_exercises = [ex for ex in exercises if any(p in ex.lower() for p in pull)]
-    leg_exercises = [ex for ex in exercises if any(l in ex.lower() for l in legs)]
-    stretch_exercises = [ex for ex in exercises if any(s in ex.lower() for s in stretch)]
-    other_exercises = [ex for ex in exercises if ex not in push_exercises + pull_exercises + leg_exercises + stretch_exercises]
+    # Categorize all exercises by type for better distribution (in a single pass)
+    push_exercises, pull_exercises, leg_exercises, stretch_exercises = [], [], [], []
+    other_exercises = []
+    categories = (
+        (_PUSH_RE, push_exercises), (_PULL_RE, pull_exercises),
+        (_LEGS_RE, leg_exercises), (_STRETCH_RE, stretch_exercises),
+    )
+    for ex in exercises:
+        ex_lower = ex.lower()
+        categorized = False
+        for pattern, group in categories:
+            if pattern.search(ex_lower):
+                group.append(ex)
+                categorized = True
+        if not categorized:
+            other_exercises.append(ex)
     
     # Distribute exercises across training days
     all_exercise_groups = [push_exercises, pull_exercises, leg_exercises, other_exercises]
@@ -140,31 +202,158 @@ def schedule_exercises(preds, days):
 def generate_multiweek(preds, weeks=4, progression='linear'):
     # preds: base week predictions; return list of week-wise preds
     # progression: 'linear' increases intensity by +1 every 2 weeks and adds a set every 2 weeks
+    names = list(preds)
+    n = len(names)
+    base_sets = np.fromiter((preds[ex]['sets'] for ex in names), np.int64, n)
+    base_intensity = np.fromiter((preds[ex]['intensity'] for ex in names), np.float64, n)
+
+    # progression rules for every (week, exercise) at once
+    add = (np.arange(max(weeks, 0)) // 2)[:, None]  # add 1 set / intensity step every 2 weeks
+    week_sets = np.maximum(1, base_sets + add).tolist()
+    week_intensity = np.minimum(10.0, base_intensity + add).tolist()
+
     weeks_out = []
-    for w in range(weeks):
-        week_preds = {}
-        for ex, v in preds.items():
-            sets = v['sets']
-            reps = v['reps']
-            intensity = v['intensity']
-            # progression rules
-            add_sets = (w // 2)  # add 1 set every 2 weeks
-            add_int = (w // 2)   # add intensity step every 2 weeks
-            week_preds[ex] = {
-                'sets': max(1, sets + add_sets),
-                'reps': reps,  # keep reps stable for simplicity
-                'intensity': min(10, intensity + add_int)
+    for sets_row, int_row in zip(week_sets, week_intensity):
+        weeks_out.append({
+            ex: {
+                'sets': sets_row[i],
+                'reps': preds[ex]['reps'],  # keep reps stable for simplicity
+                'intensity': _as_number(int_row[i])
             }
-        weeks_out.append(week_preds)
+            for i, ex in enumerate(names)
+        })
     return weeks_out
 
 
+@lru_cache(maxsize=1)
 def load_exercises_db(path=None):
+    """Return the exercise database as a tuple shared by every caller.
+    
+    The result is cached, so the exercise dicts in it must be treated as read-only.
+    """
     if path is None:
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         path = os.path.join(project_root, 'data', 'exercises.json')
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    if orjson is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            return tuple(json.load(f))
+    # Parse straight from the mapped file rather than an intermediate str copy
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as buf:
+            return tuple(orjson.loads(buf))
+
+
+# Database item plus its name/bodyParts/targetMuscles/equipments lowercased once
+_Entry = namedtuple('_Entry', ['item', 'name', 'bodyparts', 'targets', 'equipments'])
+_ExerciseIndex = namedtuple('_ExerciseIndex', ['entries', 'by_name', 'by_muscle', 'by_equipment'])
+
+
+@lru_cache(maxsize=1)
+def _load_exercise_index(path=None):
+    """Build lowercase lookup tables over the exercise database.
+
+    Buckets keep database order so "first match" semantics of a full scan are preserved.
+    """
+    entries = []
+    by_name = {}
+    by_muscle = defaultdict(list)
+    by_equipment = defaultdict(list)
+    for item in load_exercises_db(path):
+        entry = _Entry(
+            item,
+            item.get('name', '').lower(),
+            frozenset(b.lower() for b in item.get('bodyParts', [])),
+            frozenset(t.lower() for t in item.get('targetMuscles', [])),
+            frozenset(e.lower() for e in item.get('equipments', [])),
+        )
+        entries.append(entry)
+        by_name.setdefault(entry.name, entry)
+        for muscle in entry.bodyparts | entry.targets:
+            by_muscle[muscle].append(entry)
+        for e in entry.equipments:
+            by_equipment[e].append(entry)
+    return _ExerciseIndex(tuple(entries), by_name, dict(by_muscle), dict(by_equipment))
+
+
+def warm_up(exercises_path=None):
+    """Load and index the exercise database and compile the refine kernel ahead of the first request."""
+    _load_exercise_index(exercises_path)
+    # The first call compiles _refine under numba (or loads it from the on-disk cache);
+    # argument dtypes match refine_predictions so the same specialization is reused
+    one = np.ones(1, dtype=np.int64)
+    _refine(one, one, np.ones(1, dtype=np.float64), np.zeros(1, dtype=np.int64), _CAPS, 0)
+
+
+def _find_exercises(index, names):
+    """Map each lowercased exercise name to its database entry (or None).
+
+    Exact names resolve through the name index; any other name resolves to the
+    first item whose name contains it, found in one sweep over the database.
+    """
+    found = {}
+    pending = set()
+    for name in names:
+        found[name] = index.by_name.get(name)
+        if found[name] is None:
+            pending.add(name)
+
+    words = [name for name in pending if name]
+    if words and ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for name in words:
+            automaton.add_word(name, name)
+        automaton.make_automaton()
+        for entry in index.entries:
+            for _, name in automaton.iter(entry.name):
+                if name in pending:
+                    found[name] = entry
+                    pending.discard(name)
+            if not pending:
+                break
+
+    for name in pending:
+        found[name] = next((e for e in index.entries if name in e.name), None)
+    return found
+
+
+@lru_cache(maxsize=None)
+def _first_bodyweight_named(words, exercises_path=None):
+    # First body weight exercise whose name contains any of words
+    for entry in _load_exercise_index(exercises_path).by_equipment.get('body weight', ()):
+        if any(word in entry.name for word in words):
+            return entry.item
+    return None
+
+
+_BODY_WEIGHT_ONLY = frozenset({'body weight'})
+
+# Equipment keywords allowed per location; anything else is body weight only
+_ALLOWED_EQUIPMENT = MappingProxyType({
+    # Home workouts can include body weight, dumbbells, and resistance bands
+    'home': frozenset({'dumbbell', 'body weight', 'band', 'resistance band', 'kettlebell', 'exercise ball'}),
+    # Pure body weight workouts only
+    'body weight': _BODY_WEIGHT_ONLY,
+    'dumbbells': frozenset({'dumbbell', 'body weight', 'band', 'kettlebell'}),
+    # Park/outdoor workouts are typically body weight only
+    'park': _BODY_WEIGHT_ONLY,
+})
+
+
+@lru_cache(maxsize=256)
+def _muscle_substitute(mg, allowed, injuries, exercises_path=None):
+    """First exercise for a muscle group/body part that avoids injuries and fits the equipment.
+
+    allowed is None when all equipment is available. Results are cached per
+    (equipment, injuries) profile, so repeat profiles skip the database walk.
+    """
+    for entry in _load_exercise_index(exercises_path).by_muscle.get(mg, ()):
+        # skip exercises that hit injured body parts
+        if injuries & entry.bodyparts:
+            continue
+        if allowed is not None and allowed.isdisjoint(entry.equipments):
+            continue
+        return entry.item
+    return None
 
 
 def substitute_exercises(preds, available_equipment, injuries=None, exercises_path=None):
@@ -172,67 +361,43 @@ def substitute_exercises(preds, available_equipment, injuries=None, exercises_pa
 
     preds: {Exercise: {sets,reps,intensity,...}}
     available_equipment: set or 'gym' to allow all
-    injuries: list of body parts to avoid (strings)
+    injuries: iterable of body parts to avoid (strings)
     """
     if injuries is None:
         injuries = []
-    injuries = [i.strip().lower() for i in injuries if i]
+    injuries = frozenset(i.strip().lower() for i in injuries if i)
 
-    db = load_exercises_db(exercises_path)
+    # Full gym and no injuries: nothing can be unavailable or contraindicated
+    if not injuries and isinstance(available_equipment, str) and available_equipment.lower() == 'gym':
+        return dict(preds)
 
-    # simple muscle mapping for our canonical exercises
-    muscle_map = {
-        'Bench': 'chest', 'OverheadPress': 'shoulders', 'Row': 'back',
-        'Squat': 'legs', 'Deadlift': 'posterior_chain'
-    }
+    index = _load_exercise_index(exercises_path)
 
     # Normalize available_equipment into a set of keywords or 'gym' flag
     if isinstance(available_equipment, str):
         eq = available_equipment.lower()
-        if eq == 'gym':
-            allowed_all = True
-            allowed = set()
-        elif eq == 'home':
-            # Home workouts can include body weight, dumbbells, and resistance bands
-            allowed_all = False
-            allowed = {'dumbbell', 'body weight', 'band', 'resistance band', 'kettlebell', 'exercise ball'}
-        elif eq == 'body weight':
-            # Pure body weight workouts only
-            allowed_all = False
-            allowed = {'body weight'}
-        elif eq == 'dumbbells':
-            allowed_all = False
-            allowed = {'dumbbell', 'body weight', 'band', 'kettlebell'}
-        elif eq == 'park':
-            # Park/outdoor workouts are typically body weight only
-            allowed_all = False
-            allowed = {'body weight'}
-        else:
-            allowed_all = False
-            allowed = {'body weight'}
+        allowed_all = eq == 'gym'
+        allowed = frozenset() if allowed_all else _ALLOWED_EQUIPMENT.get(eq, _BODY_WEIGHT_ONLY)
     else:
         allowed_all = False
-        allowed = set(available_equipment)
+        allowed = frozenset(available_equipment)
+
+    # We will look for an exact name match in db to determine bodyParts/equipment
+    lowered = {ex: ex.lower() for ex in preds}
+    matches = _find_exercises(index, set(lowered.values()))
 
     new_preds = {}
     for ex, v in preds.items():
-        mg = muscle_map.get(ex, None)
+        mg = _MUSCLE_MAP.get(ex, None)
+        ex_lower = lowered[ex]
         # determine if ex is contraindicated by injury via body part match
         contraindicated = False
-        # We will look for an exact name match in db to determine bodyParts/equipment
-        found_exact = None
-        for item in db:
-            # basic name match: check if ex name in item name (case-insensitive)
-            if ex.lower() in item.get('name','').lower():
-                found_exact = item
-                break
+        found_exact = matches[ex_lower]
         if found_exact:
-            bodyparts = [b.lower() for b in found_exact.get('bodyParts',[])]
-            if any(b in injuries for b in bodyparts):
+            if injuries & found_exact.bodyparts:
                 contraindicated = True
             # check equipment availability
-            item_eqs = [e.lower() for e in found_exact.get('equipments',[])]
-            if not allowed_all and not any(e in allowed for e in item_eqs):
+            if not allowed_all and allowed.isdisjoint(found_exact.equipments):
                 unavailable = True
             else:
                 unavailable = False
@@ -242,7 +407,6 @@ def substitute_exercises(preds, available_equipment, injuries=None, exercises_pa
             unavailable = False
             
             # Check if exercise name contains equipment keywords that aren't allowed
-            ex_lower = ex.lower()
             if 'dumbbell' in ex_lower and 'dumbbell' not in allowed and not allowed_all:
                 unavailable = True
             elif 'barbell' in ex_lower and 'barbell' not in allowed and not allowed_all:
@@ -259,54 +423,26 @@ def substitute_exercises(preds, available_equipment, injuries=None, exercises_pa
             substitute = None
             
             # First, try to find body weight alternatives for common muscle groups
-            ex_lower = ex.lower()
             if 'biceps' in ex_lower or 'curl' in ex_lower:
                 # Look for body weight bicep exercises
-                for item in db:
-                    item_eqs = [e.lower() for e in item.get('equipments',[])]
-                    if 'body weight' in item_eqs and any(word in item.get('name','').lower() for word in ['pull', 'chin']):
-                        substitute = item
-                        break
+                substitute = _first_bodyweight_named(('pull', 'chin'), exercises_path)
             elif 'triceps' in ex_lower or 'press' in ex_lower:
                 # Look for body weight tricep exercises
-                for item in db:
-                    item_eqs = [e.lower() for e in item.get('equipments',[])]
-                    if 'body weight' in item_eqs and any(word in item.get('name','').lower() for word in ['push', 'dip']):
-                        substitute = item
-                        break
+                substitute = _first_bodyweight_named(('push', 'dip'), exercises_path)
             elif 'chest' in ex_lower or 'push' in ex_lower:
                 # Look for body weight chest exercises
-                for item in db:
-                    item_eqs = [e.lower() for e in item.get('equipments',[])]
-                    if 'body weight' in item_eqs and 'push' in item.get('name','').lower():
-                        substitute = item
-                        break
+                substitute = _first_bodyweight_named(('push',), exercises_path)
             
             # If no specific substitute found, try general matching
-            if not substitute:
-                for item in db:
-                    item_body = [b.lower() for b in item.get('bodyParts',[])]
-                    item_target = [t.lower() for t in item.get('targetMuscles',[])]
-                    # match by muscle group or body part
-                    match_muscle = False
-                    if mg and (mg in item_body or mg in item_target):
-                        match_muscle = True
-                    # skip exercises that hit injured body parts
-                    if any(b in injuries for b in item_body):
-                        continue
-                    item_eqs = [e.lower() for e in item.get('equipments',[])]
-                    if not allowed_all and not any(e in allowed for e in item_eqs):
-                        continue
-                    if match_muscle:
-                        substitute = item
-                        break
+            if not substitute and mg:
+                substitute = _muscle_substitute(mg, None if allowed_all else allowed, injuries, exercises_path)
 
             if substitute:
                 name = substitute.get('name')
                 new_preds[name] = v.copy()
             else:
                 # No substitute found - skip this exercise entirely for bodyweight-only workouts
-                if allowed == {'body weight'}:
+                if allowed == _BODY_WEIGHT_ONLY:
                     continue  # Skip dumbbell exercises when only body weight is allowed
                 else:
                     # For other equipment restrictions, reduce volume/intensity as fallback
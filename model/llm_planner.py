@@ -6,8 +6,21 @@ Generates workout plans using expert rules without requiring API keys.
 PRODUCTION MODULE - Workout plan generation
 """
 
+import logging
+
 from model.expert_rules import generate_multiweek, schedule_exercises
 
+log = logging.getLogger(__name__)
+
+# Closing tips based on goal
+_TIPS = {
+    'Muscle Gain': "💪 Tips: Focus on progressive overload, eat adequate protein, and get enough rest between sessions.",
+    'Weight Loss': "🔥 Tips: Maintain consistency, combine with cardio, and focus on compound movements for maximum calorie burn.",
+    'Strength': "🏋️ Tips: Prioritize proper form, allow adequate recovery, and gradually increase weights.",
+    'Endurance': "🏃 Tips: Build gradually, include variety in your training, and focus on consistency over intensity.",
+    'Toning': "✨ Tips: Combine resistance training with light cardio, focus on higher reps, and maintain regular training."
+}
+
 
 def call_llm_for_plan(profile, predictions, weeks=4, natural_language=False):
     """
@@ -23,36 +36,27 @@ def call_llm_for_plan(profile, predictions, weeks=4, natural_language=False):
         Dict with formatted workout plan
     """
     
-    print("Generating plan using expert rules (no API key required)...")
+    log.debug("Generating plan using expert rules (no API key required)...")
     
     # First create a schedule for the base week
     days = profile.get('Days_per_Week', 4)
     base_schedule = schedule_exercises(predictions, days)
     
-    # Generate multi-week progression using expert rules
+    # Base week as a flat (day, exercise) list, shared by every week
+    # (schedule_exercises only places exercises taken from predictions)
+    schedule_template = [
+        (day, ex_name)
+        for day, exercises in base_schedule.items()
+        for ex_name, _ in exercises
+    ]
+    
+    # Generate multi-week progression using expert rules (vectorized over weeks x exercises)
     schedule_weeks = []
-    for week in range(weeks):
-        week_preds = {}
-        for ex, v in predictions.items():
-            sets = v['sets']
-            reps = v['reps']
-            intensity = v['intensity']
-            # progression rules
-            add_sets = (week // 2)  # add 1 set every 2 weeks
-            add_int = (week // 2)   # add intensity step every 2 weeks
-            week_preds[ex] = {
-                'sets': max(1, sets + add_sets),
-                'reps': reps,  # keep reps stable for simplicity
-                'intensity': min(10, intensity + add_int)
-            }
-        
+    for week_preds in generate_multiweek(predictions, weeks):
         # Create weekly schedule with progressed parameters
-        week_schedule = {}
-        for day, exercises in base_schedule.items():
-            week_schedule[day] = []
-            for ex_name, _ in exercises:
-                if ex_name in week_preds:
-                    week_schedule[day].append((ex_name, week_preds[ex_name]))
+        week_schedule = {day: [] for day in base_schedule}
+        for day, ex_name in schedule_template:
+            week_schedule[day].append((ex_name, week_preds[ex_name]))
         
         schedule_weeks.append(week_schedule)
     
@@ -80,43 +84,33 @@ def _format_plan_as_natural_language(schedule_weeks, profile, weeks):
     gender = profile.get('Gender', 'person')
     experience = profile.get('Fitness_Level', 'intermediate')
     
-    intro = f"Here's your {weeks}-week workout plan! As a {age}-year-old {gender.lower()} focused on {goal.lower()}, training {days} days per week at {experience.lower()} level:\n\n"
-    
-    explanation = intro
+    parts = [
+        f"Here's your {weeks}-week workout plan! As a {age}-year-old {gender.lower()} focused on {goal.lower()}, "
+        f"training {days} days per week at {experience.lower()} level:\n\n"
+    ]
     
     # Add weekly breakdown
-    for week_num in range(1, weeks + 1):
-        if week_num <= len(schedule_weeks):
-            schedule = schedule_weeks[week_num - 1]
-            explanation += f"**Week {week_num}:**\n"
-            
-            # Show all 7 days of the week
-            for day in range(1, 8):
-                if day in schedule and schedule[day]:
-                    explanation += f"Day {day}: "
-                    exercises = []
-                    for ex_name, ex_data in schedule[day]:
-                        sets = ex_data.get('sets', 3)
-                        reps = ex_data.get('reps', 10)
-                        exercises.append(f"{ex_name} ({sets} sets x {reps} reps)")
-                    explanation += ", ".join(exercises) + "\n"
-                else:
-                    explanation += f"Day {day}: Rest\n"
-            explanation += "\n"
+    for week_num in range(1, min(weeks, len(schedule_weeks)) + 1):
+        schedule = schedule_weeks[week_num - 1]
+        parts.append(f"**Week {week_num}:**\n")
+        
+        # Show all 7 days of the week
+        for day in range(1, 8):
+            if day in schedule and schedule[day]:
+                exercises = ", ".join(
+                    f"{ex_name} ({ex_data.get('sets', 3)} sets x {ex_data.get('reps', 10)} reps)"
+                    for ex_name, ex_data in schedule[day]
+                )
+                parts.append(f"Day {day}: {exercises}\n")
+            else:
+                parts.append(f"Day {day}: Rest\n")
+        parts.append("\n")
     
     # Add tips based on goal
-    tips = {
-        'Muscle Gain': "💪 Tips: Focus on progressive overload, eat adequate protein, and get enough rest between sessions.",
-        'Weight Loss': "🔥 Tips: Maintain consistency, combine with cardio, and focus on compound movements for maximum calorie burn.",
-        'Strength': "🏋️ Tips: Prioritize proper form, allow adequate recovery, and gradually increase weights.",
-        'Endurance': "🏃 Tips: Build gradually, include variety in your training, and focus on consistency over intensity.",
-        'Toning': "✨ Tips: Combine resistance training with light cardio, focus on higher reps, and maintain regular training."
-    }
-    
-    explanation += tips.get(goal, "💡 Tips: Stay consistent, listen to your body, and adjust as needed.")
-    explanation += "\n\nRemember to warm up before each session and cool down afterward. Good luck with your fitness journey! 🎯"
+    parts.append(_TIPS.get(goal, "💡 Tips: Stay consistent, listen to your body, and adjust as needed."))
+    parts.append("\n\nRemember to warm up before each session and cool down afterward. Good luck with your fitness journey! 🎯")
     
-    return explanation
+    return "".join(parts)
 
 
 if __name__ == "__main__":
@@ -7,21 +7,105 @@ Works without API keys using smart keyword extraction.
 PRODUCTION MODULE - Natural language processing
 """
 
+import logging
 import re
+import string
+from functools import lru_cache
 from typing import Dict
 
+log = logging.getLogger(__name__)
 
-def parse_natural_language_input(user_message: str) -> Dict:
-    """
-    Parse natural language fitness goals into structured profile data.
-    Works without API key using smart keyword extraction.
-    
-    Args:
-        user_message: Natural language input like "28 year old male, muscle gain, gym access, 4 days per week"
-    
-    Returns:
-        Structured profile dict with Age, Gender, Goal, etc.
-    """
+
+_AGE_RE = re.compile(r'(\d+)\s*year')
+_DAYS_RE = re.compile(r'(\d+)\s*day')
+
+# Keywords per label for each profile field, in priority order (first label found wins).
+# Keywords match at the start of a word, so plurals and verb forms match too ('gyms',
+# 'started', 'strengthen'), but never inside one ('build' does not fire on 'rebuild').
+_KEYWORDS = {
+    'Gender': (
+        ('Female', ('female', 'woman', 'girl', 'she', 'her')),
+        ('Male', ('male', 'man', 'boy', 'he', 'him')),
+    ),
+    'Goal': (
+        ('Weight Loss', ('weight loss', 'lose weight', 'fat loss', 'cutting')),
+        ('Muscle Gain', ('muscle', 'build', 'bodybuilding', 'gain', 'bulk', 'mass')),
+        ('Strength', ('strength', 'strong', 'powerlifting', 'lifting')),
+        ('Endurance', ('endurance', 'cardio', 'running', 'marathon')),
+        ('Toning', ('tone', 'toning', 'lean', 'definition')),
+    ),
+    'Equipment': (
+        ('Body Weight', ('bodyweight', 'body weight', 'no equipment', 'equipment free')),
+        ('Home', ('home', 'house', 'apartment')),
+        ('Gym', ('gym', 'fitness center', 'health club')),
+        ('Park', ('park', 'outdoor', 'outside')),
+    ),
+    'Fitness_Level': (
+        ('Beginner', ('beginner', 'new', 'start', 'never', 'first time')),
+        ('Advanced', ('advanced', 'expert', 'experienced', 'competitive')),
+    ),
+}
+
+# Short keywords that would fire inside unrelated words as prefixes ('he' in 'heavy',
+# 'man' in 'many', 'mass' in 'massage'), so they only match whole words
+_WHOLE_WORD_KEYWORDS = frozenset(('she', 'her', 'he', 'him', 'man', 'mass'))
+
+_INJURY_WORDS = ('knee', 'back', 'shoulder', 'ankle', 'wrist', 'injury', 'hurt', 'pain', 'problem')
+
+
+# Punctuation splits words like whitespace ("body-weight" reads as "body weight")
+_PUNCT_TRANS = str.maketrans({c: ' ' for c in string.punctuation})
+
+
+def _build_matchers():
+    # Single words are looked up per token prefix (whole tokens only for _WHOLE_WORD_KEYWORDS);
+    # multi-word keywords are matched as phrases starting at a word boundary
+    prefix_hits = {}
+    whole_word_hits = {}
+    phrase_hits = []
+    for field, labels in _KEYWORDS.items():
+        for label, words in labels:
+            for word in words:
+                if ' ' in word:
+                    phrase_hits.append((f' {word}', (field, label)))
+                elif word in _WHOLE_WORD_KEYWORDS:
+                    whole_word_hits.setdefault(word, set()).add((field, label))
+                else:
+                    prefix_hits.setdefault(word, set()).add((field, label))
+    return (
+        {word: frozenset(hits) for word, hits in prefix_hits.items()},
+        {word: frozenset(hits) for word, hits in whole_word_hits.items()},
+        tuple(phrase_hits),
+    )
+
+
+_PREFIX_HITS, _WHOLE_WORD_HITS, _PHRASE_HITS = _build_matchers()
+_MAX_KEYWORD_LEN = max(len(word) for word in _PREFIX_HITS)
+
+
+def _keyword_hits(text):
+    """Return the set of (field, label) pairs with a keyword starting a word in text."""
+    tokens = text.translate(_PUNCT_TRANS).split()
+    hits = set()
+    for token in set(tokens):
+        hits.update(_WHOLE_WORD_HITS.get(token, ()))
+        for end in range(1, min(len(token), _MAX_KEYWORD_LEN) + 1):
+            hits.update(_PREFIX_HITS.get(token[:end], ()))
+    padded = f" {' '.join(tokens)}"
+    hits.update(hit for phrase, hit in _PHRASE_HITS if phrase in padded)
+    return hits
+
+
+def _first_label(hits, field, default):
+    for label, _ in _KEYWORDS[field]:
+        if (field, label) in hits:
+            return label
+    return default
+
+
+@lru_cache(maxsize=512)
+def _parse_cached(user_message):
+    """Parse one message into an immutable tuple of (field, value) pairs."""
     
     message_lower = user_message.lower()
     
@@ -38,64 +122,57 @@ def parse_natural_language_input(user_message: str) -> Dict:
     }
     
     # Extract age
-    age_match = re.search(r'(\d+)\s*year', message_lower)
+    age_match = _AGE_RE.search(message_lower)
     if age_match:
         age = int(age_match.group(1))
         if 16 <= age <= 80:
             profile['Age'] = age
     
+    hits = _keyword_hits(message_lower)
+    
     # Extract gender
-    if any(word in message_lower for word in ['female', 'woman', 'girl', 'she', 'her']):
-        profile['Gender'] = 'Female'
-    elif any(word in message_lower for word in ['male', 'man', 'boy', 'he', 'him']):
-        profile['Gender'] = 'Male'
+    profile['Gender'] = _first_label(hits, 'Gender', profile['Gender'])
     
     # Extract goal
-    if any(word in message_lower for word in ['weight loss', 'lose weight', 'fat loss', 'cutting']):
-        profile['Goal'] = 'Weight Loss'
-    elif any(word in message_lower for word in ['muscle', 'build', 'gain', 'bulk', 'mass']):
-        profile['Goal'] = 'Muscle Gain'
-    elif any(word in message_lower for word in ['strength', 'strong', 'powerlifting', 'lifting']):
-        profile['Goal'] = 'Strength'
-    elif any(word in message_lower for word in ['endurance', 'cardio', 'running', 'marathon']):
-        profile['Goal'] = 'Endurance'
-    elif any(word in message_lower for word in ['tone', 'toning', 'lean', 'definition']):
-        profile['Goal'] = 'Toning'
+    profile['Goal'] = _first_label(hits, 'Goal', profile['Goal'])
     
     # Extract days per week
-    days_match = re.search(r'(\d+)\s*day', message_lower)
+    days_match = _DAYS_RE.search(message_lower)
     if days_match:
         days = int(days_match.group(1))
         if 2 <= days <= 6:
             profile['Days_per_Week'] = days
     
     # Extract equipment/location
-    if any(word in message_lower for word in ['bodyweight', 'body weight', 'no equipment', 'equipment free']):
-        profile['Equipment'] = 'Body Weight'
-    elif any(word in message_lower for word in ['home', 'house', 'apartment']):
-        profile['Equipment'] = 'Home'
-    elif any(word in message_lower for word in ['gym', 'fitness center', 'health club']):
-        profile['Equipment'] = 'Gym'
-    elif any(word in message_lower for word in ['park', 'outdoor', 'outside']):
-        profile['Equipment'] = 'Park'
+    profile['Equipment'] = _first_label(hits, 'Equipment', profile['Equipment'])
     
     # Extract experience level
-    if any(word in message_lower for word in ['beginner', 'new', 'start', 'never', 'first time']):
-        profile['Fitness_Level'] = 'Beginner'
-    elif any(word in message_lower for word in ['advanced', 'expert', 'experienced', 'competitive']):
-        profile['Fitness_Level'] = 'Advanced'
-    else:
-        profile['Fitness_Level'] = 'Intermediate'
+    profile['Fitness_Level'] = _first_label(hits, 'Fitness_Level', 'Intermediate')
     
     # Extract injuries
-    injury_words = ['knee', 'back', 'shoulder', 'ankle', 'wrist', 'injury', 'hurt', 'pain', 'problem']
-    injuries = []
-    for word in injury_words:
-        if word in message_lower:
-            injuries.append(word)
-    profile['Injuries'] = list(set(injuries))  # Remove duplicates
-    
-    print(f"Parsed profile from '{user_message}': {profile}")
+    injuries = {word for word in _INJURY_WORDS if word in message_lower}
+    profile['Injuries'] = tuple(injuries)
+    
+    return tuple(profile.items())
+
+
+def parse_natural_language_input(user_message: str) -> Dict:
+    """
+    Parse natural language fitness goals into structured profile data.
+    Works without API key using smart keyword extraction.
+    
+    Args:
+        user_message: Natural language input like "28 year old male, muscle gain, gym access, 4 days per week"
+    
+    Returns:
+        Structured profile dict with Age, Gender, Goal, etc.
+    """
+    
+    # Identical messages are parsed once; each caller gets its own dict
+    profile = dict(_parse_cached(user_message))
+    profile['Injuries'] = list(profile['Injuries'])
+    
+    log.debug("Parsed profile from '%s': %s", user_message, profile)
     return profile
 
 
@@ -11,16 +11,114 @@ PRODUCTION MODULE - Core ML prediction functionality
 import joblib
 import pandas as pd
 import json
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the post-processing kernel runs as plain NumPy
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json parser is used without it
+    orjson = None
+
+try:
+    import onnxruntime
+except ImportError:  # onnxruntime is optional; the pickled models predict without it
+    onnxruntime = None
+
+log = logging.getLogger(__name__)
+
+# Map muscle groups to exercise database muscles
+_MUSCLE_GROUP_MAP = {
+    'chest': ('chest', 'pectorals', 'upper chest', 'lower chest'),
+    'back': ('latissimus dorsi', 'rhomboids', 'middle trapezius', 'lower trapezius'),
+    'shoulders': ('deltoids', 'anterior deltoids', 'lateral deltoids', 'posterior deltoids'),
+    'biceps': ('biceps', 'brachialis', 'brachioradialis'),
+    'triceps': ('triceps',),
+    'legs': ('quadriceps', 'hamstrings', 'glutes', 'calves'),
+    'core': ('abdominals', 'obliques', 'lower abs', 'core'),
+    'forearms': ('forearm flexors', 'forearm extensors', 'grip muscles')
+}
+
+# Main muscle group for database muscles named in target exercises
+_MUSCLE_TO_GROUP = {
+    'chest': 'chest', 'pectorals': 'chest',
+    'latissimus dorsi': 'back', 'rhomboids': 'back', 'trapezius': 'back',
+    'deltoids': 'shoulders',
+    'biceps': 'biceps',
+    'triceps': 'triceps',
+    'quadriceps': 'legs', 'hamstrings': 'legs', 'glutes': 'legs',
+    'abdominals': 'core', 'obliques': 'core'
+}
+
+# Default equipment based on location
+_EQUIPMENT_MAP = {
+    'Home': ('body weight', 'dumbbell', 'resistance band'),
+    'Gym': ('barbell', 'dumbbell', 'machine', 'cable', 'kettlebell'),
+    'Park': ('body weight', 'resistance band')
+}
+
+# Fallback parameters per goal when the model cannot predict
+_DEFAULTS = {
+    'Muscle Gain': {'sets': 3, 'reps': 10, 'intensity': 75, 'weight': 5.0, 'rpe': 7.5},
+    'Strength': {'sets': 4, 'reps': 5, 'intensity': 85, 'weight': 7.0, 'rpe': 8.5},
+    'Endurance': {'sets': 3, 'reps': 15, 'intensity': 65, 'weight': 3.0, 'rpe': 6.5},
+    'Weight Loss': {'sets': 3, 'reps': 12, 'intensity': 70, 'weight': 4.0, 'rpe': 7.0},
+    'Toning': {'sets': 3, 'reps': 12, 'intensity': 65, 'weight': 3.5, 'rpe': 6.5}
+}
+
+# Rounding/clipping rule per target column
+_SETS_REPS, _INTENSITY, _WEIGHT, _RPE, _OTHER = range(5)
+_TARGET_KINDS = {'sets': _SETS_REPS, 'reps': _SETS_REPS, 'intensity': _INTENSITY, 'weight': _WEIGHT, 'rpe': _RPE}
+_INTEGER_KINDS = frozenset((_SETS_REPS, _INTENSITY))
+
+@njit(cache=True)
+def _round_targets(predictions, kinds):
+    # predictions: float64[rows, targets]; kinds: int64[targets] from _TARGET_KINDS
+    out = np.empty_like(predictions)
+    for i in range(predictions.shape[1]):
+        values = predictions[:, i]
+        kind = kinds[i]
+        if kind == _SETS_REPS:
+            out[:, i] = np.maximum(1.0, np.rint(values))
+        elif kind == _INTENSITY:
+            out[:, i] = np.minimum(np.maximum(np.rint(values), 50.0), 100.0)
+        elif kind == _WEIGHT:
+            out[:, i] = np.maximum(0.0, np.around(values, 1))
+        elif kind == _RPE:
+            out[:, i] = np.minimum(np.maximum(np.around(values, 1), 5.0), 10.0)
+        else:
+            out[:, i] = np.around(values, 2)
+    return out
+
+def _load_json(path):
+    """Parse a JSON file, with orjson when it is installed."""
+    if orjson is None:
+        with open(path, 'r') as f:
+            return json.load(f)
+    return orjson.loads(path.read_bytes())
 
 class ComprehensiveFitnessPredictor:
     """Enhanced fitness predictor using comprehensive exercise database."""
     
+    # Cached predictions, keyed by the full model feature row
+    PREDICTION_CACHE_SIZE = 4096
+    
     def __init__(self):
         """Initialize the predictor by loading model artifacts."""
         self.model_dir = Path(__file__).parent
         self.data_dir = self.model_dir.parent / "data"
+        self._prediction_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         # Load model and metadata
         self._load_model_artifacts()
@@ -35,16 +133,15 @@ class ComprehensiveFitnessPredictor:
                 self.model = joblib.load(model_file)
                 
                 # Load metadata
-                with open(self.model_dir / "model_info.json", 'r') as f:
-                    self.model_info = json.load(f)
+                self.model_info = _load_json(self.model_dir / "model_info.json")
                 
                 self.feature_columns = self.model_info['feature_columns']
                 self.target_columns = self.model_info['target_columns']
-                print("Loaded comprehensive model successfully")
+                log.debug("Loaded comprehensive model successfully")
                 
             else:
                 # Fallback to old model if comprehensive model doesn't exist
-                print("Comprehensive model not found, falling back to old model...")
+                log.debug("Comprehensive model not found, falling back to old model...")
                 self.model = joblib.load(self.model_dir / "sets_model.pkl")
                 self.feature_columns = joblib.load(self.model_dir / "feature_cols.pkl")
                 self.target_columns = joblib.load(self.model_dir / "target_cols.pkl")
@@ -54,98 +151,206 @@ class ComprehensiveFitnessPredictor:
                 }
                 
         except Exception as e:
-            print(f"Error loading model: {e}")
+            log.warning("Error loading model: %s", e)
             raise
+        
+        self._target_kinds = np.array(
+            [_TARGET_KINDS.get(target, _OTHER) for target in self.target_columns], dtype=np.int64
+        )
+        self._prepare_array_encoder()
+        self._onnx_session = self._load_onnx_session()
+    
+    def _prepare_array_encoder(self):
+        """Set up NumPy-level encoding of feature rows for the loaded model.
+        
+        Models trained on native categoricals (model_info lists 'categories') take raw
+        numerical values plus integer category codes, in feature_columns order; they are
+        either a single estimator or a {target: model} dict with one model per target.
+        A fitted Pipeline(ColumnTransformer, regressor) with StandardScaler and
+        OneHotEncoder transformers is split into the same encoding. For any other model
+        layout self._final_estimator stays None and predictions go through the full
+        pipeline with a DataFrame.
+        """
+        self._final_estimator = None
+        self._code_columns = []  # (feature, output index, {category: code})
+        
+        categories = self.model_info.get('categories')
+        if categories:
+            self._num_columns = []
+            for idx, feature in enumerate(self.feature_columns):
+                if feature in categories:
+                    codes = {category: code for code, category in enumerate(categories[feature])}
+                    self._code_columns.append((feature, idx, codes))
+                else:
+                    self._num_columns.append((feature, idx, 0.0, 1.0))
+            self._cat_columns = []
+            self._n_encoded = len(self.feature_columns)
+            self._final_estimator = self.model
+            return
+        
+        steps = getattr(self.model, 'steps', None)
+        if not steps or len(steps) != 2 or not isinstance(steps[0][1], ColumnTransformer):
+            return
+        preprocessor, final_estimator = steps[0][1], steps[1][1]
+        
+        num_columns = []  # (feature, output index, mean, scale)
+        cat_columns = []  # (feature, {category: output index or None when dropped})
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            offset = preprocessor.output_indices_[name].start
+            if isinstance(transformer, StandardScaler):
+                for j, feature in enumerate(columns):
+                    mean = transformer.mean_[j] if transformer.mean_ is not None else 0.0
+                    scale = transformer.scale_[j] if transformer.scale_ is not None else 1.0
+                    num_columns.append((feature, offset + j, mean, scale))
+            elif (isinstance(transformer, OneHotEncoder)
+                  and transformer.handle_unknown == 'error'
+                  and getattr(transformer, 'infrequent_categories_', None) is None):
+                drop_idx = transformer.drop_idx_
+                for j, feature in enumerate(columns):
+                    dropped = drop_idx[j] if drop_idx is not None else None
+                    index = {}
+                    for k, category in enumerate(transformer.categories_[j].tolist()):
+                        if k == dropped:
+                            index[category] = None
+                        else:
+                            index[category] = offset
+                            offset += 1
+                    cat_columns.append((feature, index))
+            else:
+                return
+        
+        self._num_columns = num_columns
+        self._cat_columns = cat_columns
+        self._n_encoded = sum(part.stop - part.start for part in preprocessor.output_indices_.values())
+        self._final_estimator = final_estimator
+    
+    def _load_onnx_session(self):
+        """Open the ONNX export of the model, when training saved one and onnxruntime is installed."""
+        onnx_file = self.model_dir / "comprehensive_model.onnx"
+        if onnxruntime is None or not self.model_info.get('onnx_model') or not onnx_file.exists():
+            return None
+        try:
+            return onnxruntime.InferenceSession(str(onnx_file), providers=['CPUExecutionProvider'])
+        except Exception as e:
+            log.warning("Could not load ONNX model, using the pickled model: %s", e)
+            return None
+    
+    def _encode_rows(self, rows):
+        """Encode feature dicts exactly as the model's fitted preprocessing would."""
+        X = np.zeros((len(rows), self._n_encoded))
+        for r, row in enumerate(rows):
+            for feature, idx, mean, scale in self._num_columns:
+                X[r, idx] = (row[feature] - mean) / scale
+            for feature, idx, codes in self._code_columns:
+                # Unseen categories become negative codes, which the model treats as missing
+                X[r, idx] = codes.get(row[feature], -1)
+            for feature, index in self._cat_columns:
+                # Unknown categories raise, like the pipeline's OneHotEncoder
+                idx = index[row[feature]]
+                if idx is not None:
+                    X[r, idx] = 1.0
+        return X
+    
+    def _predict_encoded(self, X):
+        """Predict every target for an encoded feature matrix."""
+        if self._onnx_session is not None:
+            # One run evaluates all targets' trees; the graph outputs columns in target order
+            return self._onnx_session.run(None, {'input': X.astype(np.float32)})[0]
+        if isinstance(self._final_estimator, dict):
+            return np.column_stack([self._final_estimator[target].predict(X) for target in self.target_columns])
+        return self._final_estimator.predict(X)
     
     def _load_exercise_database(self):
         """Load the exercise database."""
         try:
-            with open(self.data_dir / "exercises.json", 'r') as f:
-                self.exercises = json.load(f)
-            
-            # Create lookup dictionaries
-            self.exercises_by_name = {ex['name']: ex for ex in self.exercises}
-            self.exercises_by_muscle = {}
-            
-            # Group exercises by target muscle
-            for exercise in self.exercises:
-                for muscle in exercise.get('targetMuscles', []):
-                    if muscle not in self.exercises_by_muscle:
-                        self.exercises_by_muscle[muscle] = []
-                    self.exercises_by_muscle[muscle].append(exercise)
-            
-            print(f"Loaded {len(self.exercises)} exercises from database")
+            self._build_exercise_indices(_load_json(self.data_dir / "exercises.json"))
+            log.debug("Loaded %s exercises from database", len(self.exercises))
             
         except Exception as e:
-            print(f"Error loading exercise database: {e}")
+            log.warning("Error loading exercise database: %s", e)
             # Create fallback exercise list
             self.exercises = []
             self.exercises_by_name = {}
             self.exercises_by_muscle = {}
+            self._group_to_exercises = {}
+    
+    def _build_exercise_indices(self, exercises):
+        """Build the name, muscle and muscle group lookups for the exercise list."""
+        self.exercises = exercises
+        
+        # Create lookup dictionaries
+        self.exercises_by_name = {ex['name']: ex for ex in self.exercises}
+        self.exercises_by_muscle = {}
+        
+        # Group exercises by target muscle
+        for exercise in self.exercises:
+            for muscle in exercise.get('targetMuscles', []):
+                if muscle not in self.exercises_by_muscle:
+                    self.exercises_by_muscle[muscle] = []
+                self.exercises_by_muscle[muscle].append(exercise)
+            exercise['_equip_set'] = frozenset(exercise.get('equipments', ['body weight']))
+        
+        # Candidate exercises per muscle group, in lookup order without repeats
+        self._group_to_exercises = {
+            muscle_group: self._collect_exercises(target_muscles)
+            for muscle_group, target_muscles in _MUSCLE_GROUP_MAP.items()
+        }
+    
+    def _collect_exercises(self, target_muscles):
+        """Union of the exercises for the given muscles, keeping first occurrences."""
+        seen = set()
+        collected = []
+        for muscle in target_muscles:
+            for exercise in self.exercises_by_muscle.get(muscle, []):
+                if id(exercise) not in seen:
+                    seen.add(id(exercise))
+                    collected.append(exercise)
+        return collected
     
     def get_exercise_recommendations(self, user_profile, muscle_groups, available_equipment=None):
         """Get exercise recommendations based on user profile and muscle groups."""
         
         if available_equipment is None:
             # Default equipment based on location
-            equipment_map = {
-                'Home': ['body weight', 'dumbbell', 'resistance band'],
-                'Gym': ['barbell', 'dumbbell', 'machine', 'cable', 'kettlebell'],
-                'Park': ['body weight', 'resistance band']
-            }
-            available_equipment = equipment_map.get(user_profile.get('location', 'Gym'), 
-                                                  ['body weight', 'dumbbell'])
-        
-        # Map muscle groups to exercise database muscles
-        muscle_map = {
-            'chest': ['chest', 'pectorals', 'upper chest', 'lower chest'],
-            'back': ['latissimus dorsi', 'rhomboids', 'middle trapezius', 'lower trapezius'],
-            'shoulders': ['deltoids', 'anterior deltoids', 'lateral deltoids', 'posterior deltoids'],
-            'biceps': ['biceps', 'brachialis', 'brachioradialis'],
-            'triceps': ['triceps'],
-            'legs': ['quadriceps', 'hamstrings', 'glutes', 'calves'],
-            'core': ['abdominals', 'obliques', 'lower abs', 'core'],
-            'forearms': ['forearm flexors', 'forearm extensors', 'grip muscles']
-        }
+            available_equipment = _EQUIPMENT_MAP.get(user_profile.get('location', 'Gym'), 
+                                                     ('body weight', 'dumbbell'))
         
+        avail = frozenset(available_equipment)
         recommendations = {}
         
         for muscle_group in muscle_groups:
-            target_muscles = muscle_map.get(muscle_group, [muscle_group])
-            suitable_exercises = []
+            candidates = self._group_to_exercises.get(muscle_group)
+            if candidates is None:
+                candidates = self.exercises_by_muscle.get(muscle_group, [])
             
-            # Find exercises for this muscle group
-            for muscle in target_muscles:
-                if muscle in self.exercises_by_muscle:
-                    for exercise in self.exercises_by_muscle[muscle]:
-                        # Check if exercise uses available equipment
-                        exercise_equipment = exercise.get('equipments', ['body weight'])
-                        if any(eq in available_equipment for eq in exercise_equipment):
-                            suitable_exercises.append(exercise)
-            
-            # Remove duplicates
+            # Keep exercises that use available equipment, without duplicate names
             seen_names = set()
             unique_exercises = []
-            for ex in suitable_exercises:
-                if ex['name'] not in seen_names:
+            for ex in candidates:
+                if ex['_equip_set'] & avail and ex['name'] not in seen_names:
                     unique_exercises.append(ex)
                     seen_names.add(ex['name'])
+                    if len(unique_exercises) == 10:  # Limit to top 10
+                        break
             
-            recommendations[muscle_group] = unique_exercises[:10]  # Limit to top 10
+            recommendations[muscle_group] = unique_exercises
         
         return recommendations
     
     def predict_exercise_parameters(self, user_profile, exercise_name, muscle_group=None):
         """Predict sets, reps, intensity, weight, RPE for a specific exercise."""
+        return self.predict_batch(user_profile, [(exercise_name, muscle_group)])[0]
+    
+    def predict_batch(self, user_profile, items):
+        """Predict parameters for many (exercise_name, muscle_group) pairs with one model call.
         
-        # Get exercise info
-        exercise = self.exercises_by_name.get(exercise_name)
-        if not exercise:
-            print(f"Exercise '{exercise_name}' not found in database")
-            return self._get_default_parameters(user_profile)
+        Returns a list of parameter dicts aligned with items.
+        """
         
-        # Prepare input features
-        features = {
+        # Profile features are shared by every row
+        profile_features = {
             'age': user_profile.get('age', 30),
             'gender': user_profile.get('gender', 'Male'),
             'goal': user_profile.get('goal', 'Muscle Gain'),
@@ -155,74 +360,127 @@ class ComprehensiveFitnessPredictor:
             'body_type': user_profile.get('body_type', 'Mesomorph')
         }
         
-        # Add exercise-specific features if using comprehensive model
-        if 'muscle_group' in self.feature_columns:
-            features['muscle_group'] = muscle_group or 'chest'
-            features['equipment'] = exercise.get('equipments', ['body weight'])[0]
-            features['bodypart'] = exercise.get('bodyParts', ['chest'])[0]
+        results = [None] * len(items)
+        pending = {}  # feature row key -> positions in items still to predict
+        for pos, (exercise_name, muscle_group) in enumerate(items):
+            # Get exercise info
+            exercise = self.exercises_by_name.get(exercise_name)
+            if not exercise:
+                log.debug("Exercise '%s' not found in database", exercise_name)
+                results[pos] = self._get_default_parameters(user_profile)
+                continue
+            
+            features = dict(profile_features)
+            # Add exercise-specific features if using comprehensive model
+            if 'muscle_group' in self.feature_columns:
+                features['muscle_group'] = muscle_group or 'chest'
+                features['equipment'] = exercise.get('equipments', ['body weight'])[0]
+                features['bodypart'] = exercise.get('bodyParts', ['chest'])[0]
+            
+            key = tuple(features.items())
+            with self._cache_lock:
+                cached = self._prediction_cache.get(key)
+                if cached is not None:
+                    self._prediction_cache.move_to_end(key)
+            if cached is not None:
+                results[pos] = dict(cached)
+            else:
+                pending.setdefault(key, []).append(pos)
         
-        # Create DataFrame with correct column order
-        input_df = pd.DataFrame([features])
+        if not pending:
+            return results
         
-        # Make prediction
+        # Make one prediction for all uncached rows
+        keys = list(pending)
         try:
-            prediction = self.model.predict(input_df)[0]
-            
-            # Map prediction to named results
-            result = {}
-            for i, target in enumerate(self.target_columns):
-                value = prediction[i]
-                
-                # Round appropriately
-                if target in ['sets', 'reps']:
-                    result[target] = max(1, int(round(value)))
-                elif target == 'intensity':
-                    result[target] = max(50, min(100, int(round(value))))
-                elif target == 'weight':
-                    result[target] = max(0, round(value, 1))
-                elif target == 'rpe':
-                    result[target] = max(5, min(10, round(value, 1)))
-                else:
-                    result[target] = round(value, 2)
-            
-            return result
-            
+            rows = [dict(key) for key in keys]
+            if self._final_estimator is not None:
+                predictions = self._predict_encoded(self._encode_rows(rows))
+            else:
+                predictions = self.model.predict(pd.DataFrame(rows))
+            predictions = np.asarray(predictions).reshape(len(keys), -1)
+            batch_params = self._postprocess_predictions(predictions)
         except Exception as e:
-            print(f"Error making prediction: {e}")
-            return self._get_default_parameters(user_profile)
+            log.warning("Error making prediction: %s", e)
+            for positions in pending.values():
+                for pos in positions:
+                    results[pos] = self._get_default_parameters(user_profile)
+            return results
+        
+        with self._cache_lock:
+            for key, params in zip(keys, batch_params):
+                self._prediction_cache[key] = params
+                self._prediction_cache.move_to_end(key)
+            while len(self._prediction_cache) > self.PREDICTION_CACHE_SIZE:
+                self._prediction_cache.popitem(last=False)
+        
+        for key, params in zip(keys, batch_params):
+            for pos in pending[key]:
+                results[pos] = dict(params)
+        
+        return results
+    
+    def _postprocess_predictions(self, predictions):
+        """Round/clip raw model outputs column-wise and map them to named results."""
+        rounded = _round_targets(np.ascontiguousarray(predictions, dtype=np.float64), self._target_kinds)
+        columns = {}
+        for i, target in enumerate(self.target_columns):
+            values = rounded[:, i]
+            if self._target_kinds[i] in _INTEGER_KINDS:
+                values = values.astype(int)
+            columns[target] = values.tolist()
+        
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
     
     def _get_default_parameters(self, user_profile):
         """Get default parameters when prediction fails."""
         goal = user_profile.get('goal', 'Muscle Gain')
         experience = user_profile.get('experience', 'Intermediate')
         
-        defaults = {
-            'Muscle Gain': {'sets': 3, 'reps': 10, 'intensity': 75, 'weight': 5.0, 'rpe': 7.5},
-            'Strength': {'sets': 4, 'reps': 5, 'intensity': 85, 'weight': 7.0, 'rpe': 8.5},
-            'Endurance': {'sets': 3, 'reps': 15, 'intensity': 65, 'weight': 3.0, 'rpe': 6.5},
-            'Weight Loss': {'sets': 3, 'reps': 12, 'intensity': 70, 'weight': 4.0, 'rpe': 7.0},
-            'Toning': {'sets': 3, 'reps': 12, 'intensity': 65, 'weight': 3.5, 'rpe': 6.5}
-        }
-        
-        base_params = defaults.get(goal, defaults['Muscle Gain'])
+        # Copy so callers never mutate the shared defaults
+        base_params = dict(_DEFAULTS.get(goal, _DEFAULTS['Muscle Gain']))
         
         # Adjust for experience
         if experience == 'Beginner':
-            base_params = base_params.copy()
             base_params['sets'] = max(2, base_params['sets'] - 1)
             base_params['intensity'] *= 0.9
             base_params['weight'] *= 0.7
         elif experience == 'Advanced':
-            base_params = base_params.copy()
             base_params['sets'] += 1
             base_params['intensity'] = min(95, base_params['intensity'] * 1.1)
             base_params['weight'] *= 1.3
         
         return base_params
 
+_PREDICTOR_SINGLETON = None
+_PREDICTOR_LOCK = threading.Lock()
+
+def _get_predictor():
+    """Return the shared predictor, loading model artifacts on first use."""
+    global _PREDICTOR_SINGLETON
+    if _PREDICTOR_SINGLETON is None:
+        with _PREDICTOR_LOCK:
+            if _PREDICTOR_SINGLETON is None:
+                _PREDICTOR_SINGLETON = ComprehensiveFitnessPredictor()
+    return _PREDICTOR_SINGLETON
+
+def warm_up():
+    """Load the model and exercise database ahead of the first prediction.
+    
+    A model that fails to load is only logged, so the server still starts; predict()
+    retries the load and reports the error per request.
+    """
+    try:
+        predictor = _get_predictor()
+    except Exception as e:
+        log.warning("Model not loaded at startup: %s", e)
+        return
+    # Compile the post-processing kernel (or load it from numba's on-disk cache)
+    predictor._postprocess_predictions(np.zeros((1, len(predictor.target_columns))))
+
 def predict(user_profile, target_exercises=None):
     """Main prediction function for backward compatibility."""
-    predictor = ComprehensiveFitnessPredictor()
+    predictor = _get_predictor()
     
     # Handle both old and new profile formats
     def get_profile_value(profile, new_key, old_key, default):
@@ -241,29 +499,15 @@ def predict(user_profile, target_exercises=None):
     
     # Get muscle groups from exercises or use defaults
     if target_exercises:
-        muscle_groups = []
+        muscle_groups = set()
         for exercise_name in target_exercises:
             exercise = predictor.exercises_by_name.get(exercise_name)
             if exercise:
-                target_muscles = exercise.get('targetMuscles', [])
                 # Map to main muscle groups
-                for muscle in target_muscles:
-                    if muscle in ['chest', 'pectorals']:
-                        muscle_groups.append('chest')
-                    elif muscle in ['latissimus dorsi', 'rhomboids', 'trapezius']:
-                        muscle_groups.append('back')
-                    elif muscle in ['deltoids']:
-                        muscle_groups.append('shoulders')
-                    elif muscle in ['biceps']:
-                        muscle_groups.append('biceps')
-                    elif muscle in ['triceps']:
-                        muscle_groups.append('triceps')
-                    elif muscle in ['quadriceps', 'hamstrings', 'glutes']:
-                        muscle_groups.append('legs')
-                    elif muscle in ['abdominals', 'obliques']:
-                        muscle_groups.append('core')
-        
-        muscle_groups = list(set(muscle_groups))  # Remove duplicates
+                for muscle in exercise.get('targetMuscles', []):
+                    group = _MUSCLE_TO_GROUP.get(muscle)
+                    if group:
+                        muscle_groups.add(group)
     else:
         # Default workout split
         muscle_groups = ['chest', 'back', 'shoulders', 'biceps', 'triceps', 'legs', 'core']
@@ -271,32 +515,36 @@ def predict(user_profile, target_exercises=None):
     # Get exercise recommendations
     recommendations = predictor.get_exercise_recommendations(normalized_profile, muscle_groups)
     
-    # Get predictions for each recommended exercise
-    results = {}
-    for muscle_group, exercises in recommendations.items():
-        results[muscle_group] = []
-        
-        for exercise in exercises[:3]:  # Limit to top 3 per muscle group
-            try:
-                params = predictor.predict_exercise_parameters(
-                    normalized_profile, exercise['name'], muscle_group
-                )
-                
-                exercise_result = {
-                    'exercise': exercise['name'],
-                    'muscle_group': muscle_group,
-                    'equipment': exercise.get('equipments', [''])[0],
-                    'target_muscles': exercise.get('targetMuscles', []),
-                    'parameters': params
-                }
-                
-                results[muscle_group].append(exercise_result)
-            except Exception as e:
-                print(f"Error predicting for {exercise['name']}: {e}")
-                continue
+    # Get predictions for every recommended exercise in a single batch
+    selected = [
+        (muscle_group, exercise)
+        for muscle_group, exercises in recommendations.items()
+        for exercise in exercises[:3]  # Limit to top 3 per muscle group
+    ]
+    batch_params = predictor.predict_batch(
+        normalized_profile, [(exercise['name'], muscle_group) for muscle_group, exercise in selected]
+    )
+    
+    results = {muscle_group: [] for muscle_group in recommendations}
+    for (muscle_group, exercise), params in zip(selected, batch_params):
+        results[muscle_group].append({
+            'exercise': exercise['name'],
+            'muscle_group': muscle_group,
+            'equipment': exercise.get('equipments', [''])[0],
+            'target_muscles': exercise.get('targetMuscles', []),
+            'parameters': params
+        })
     
     return results
 
+def flatten_predictions(raw_preds):
+    """Flatten predict() output into {exercise: {sets, reps, intensity}} for the expert rules."""
+    return {
+        exercise_data['exercise']: {k: exercise_data['parameters'][k] for k in ('sets', 'reps', 'intensity')}
+        for exercises in raw_preds.values()
+        for exercise_data in exercises
+    }
+
 # For testing
 if __name__ == "__main__":
     # Test the updated predictor
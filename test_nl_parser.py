@@ -0,0 +1,50 @@
+"""
+Keyword matching tests for the natural language parser
+
+Pins the keyword matches the parser keeps from the original substring matching
+(plurals and verb forms of the keywords), and the false positives it no longer makes.
+
+Usage:
+    pytest test_nl_parser.py
+"""
+
+import pytest
+
+from model.nl_parser import parse_natural_language_input
+
+
+@pytest.mark.parametrize("message, field, expected", [
+    # Plurals and verb forms still match their keyword
+    ("program for beginners", 'Fitness_Level', 'Beginner'),
+    ("just started training", 'Fitness_Level', 'Beginner'),
+    ("first timer, 3 days", 'Fitness_Level', 'Beginner'),
+    ("i train outdoors", 'Equipment', 'Park'),
+    ("i go to gyms", 'Equipment', 'Gym'),
+    ("health clubs only", 'Equipment', 'Gym'),
+    ("want to strengthen my core", 'Goal', 'Strength'),
+    ("getting stronger", 'Goal', 'Strength'),
+    ("gaining muscles", 'Goal', 'Muscle Gain'),
+    ("bodybuilding split", 'Goal', 'Muscle Gain'),
+    ("bulking season", 'Goal', 'Muscle Gain'),
+    ("i want to get toned", 'Goal', 'Toning'),
+    ("experienced women", 'Fitness_Level', 'Advanced'),
+    ("for girls", 'Gender', 'Female'),
+    ("25 year old female, weight loss, home workouts, 3 days", 'Goal', 'Weight Loss'),
+    ("28 year old male, muscle gain, gym access, 4 days per week", 'Gender', 'Male'),
+    # Punctuation separates words
+    ("body-weight only", 'Equipment', 'Body Weight'),
+])
+def test_keyword_matches(message, field, expected):
+    assert parse_natural_language_input(message)[field] == expected
+
+
+@pytest.mark.parametrize("message, field, expected", [
+    # Keywords no longer fire inside other words
+    ("the shelf", 'Gender', 'Male'),
+    ("rebuild my routine, endurance", 'Goal', 'Endurance'),
+    # Short keywords only match whole words
+    ("heavy weights, many reps, female", 'Gender', 'Female'),
+    ("massage and cardio", 'Goal', 'Endurance'),
+])
+def test_keywords_do_not_match_inside_words(message, field, expected):
+    assert parse_natural_language_input(message)[field] == expected
@@ -3,8 +3,8 @@
 Model Training Script - Regenerates the AI Fitness Planner Model
 
 This script trains the comprehensive fitness model from the workout data.
-The resulting model file (comprehensive_model.pkl) is 219MB and excluded 
-from GitHub due to size limits.
+The resulting model file (comprehensive_model.pkl) is excluded from GitHub
+and has to be regenerated locally.
 
 Usage:
     python train_model.py
@@ -13,9 +13,15 @@ Requirements:
     - pandas
     - scikit-learn
     - numpy
+    - lightgbm (optional, used instead of scikit-learn's gradient boosting when installed)
+    - pyarrow (optional, faster CSV parsing)
+    - lz4 (optional, faster model loading)
+    - onnx, onnxmltools (optional, exports the LightGBM models to ONNX)
+    - orjson (optional, faster JSON writing)
 
 Output:
-    - model/comprehensive_model.pkl (219MB)
+    - model/comprehensive_model.pkl
+    - model/comprehensive_model.onnx (LightGBM models, when onnxmltools is installed)
     - model/model_info.json (feature specifications)
 """
 
@@ -23,25 +29,159 @@ import pandas as pd
 import numpy as np
 import json
 import joblib
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_squared_error, r2_score
+from threadpoolctl import threadpool_limits
 import os
 
+try:
+    import pyarrow
+except ImportError:  # pyarrow is optional; pandas' default C parser reads the CSV without it
+    pyarrow = None
+
+try:
+    import lz4
+except ImportError:  # lz4 is optional; the model is zlib-compressed without it
+    lz4 = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json encoder writes model_info.json without it
+    orjson = None
+
+try:
+    import lightgbm as lgb
+except ImportError:  # LightGBM is optional; scikit-learn's HistGradientBoostingRegressor is used without it
+    lgb = None
+
+try:
+    from onnx import compose, helper, TensorProto, save as save_onnx
+    from onnxmltools import convert_lightgbm
+    from onnxmltools.convert.common.data_types import FloatTensorType
+except ImportError:  # onnxmltools is optional; the models are only saved as a pickle without it
+    convert_lightgbm = None
+
+def _load_training_data(path, dtypes):
+    """Read only the given columns of the training CSV, parsed straight into their dtypes."""
+    engine = 'pyarrow' if pyarrow is not None else 'c'
+    return pd.read_csv(path, engine=engine, usecols=list(dtypes), dtype=dtypes)
+
+def _cap_strata(data, stratum_columns, max_rows, seed=42):
+    """Keep a random sample of at most max_rows rows from each stratum, in the original row order.
+    
+    Strata that are already within the cap are kept whole; missing values form strata of their own.
+    """
+    rng = np.random.default_rng(seed)
+    draws = pd.Series(rng.random(len(data)), index=data.index)
+    rank = draws.groupby([data[col] for col in stratum_columns], observed=True, dropna=False).rank(method='first')
+    return data[rank <= max_rows]
+
+def _prepare_training_data(path, feature_columns, target_columns, categorical_features,
+                           stratum_columns, max_rows_per_stratum):
+    """Load the training CSV, cap the rows per stratum and encode it into (X, y, categories)."""
+    # Parse categoricals directly as category dtype
+    dtypes = {'age': 'int16', 'training_days': 'int8'}
+    dtypes.update({col: 'category' for col in categorical_features})
+    dtypes.update({col: 'float32' for col in target_columns})
+    data = _load_training_data(path, dtypes)
+    
+    # Bound the training set size without losing rare combinations: only oversized strata are subsampled
+    data = _cap_strata(data, stratum_columns, max_rows_per_stratum)
+    
+    # Categoricals are used as integer codes for native categorical splits (no one-hot columns);
+    # the category lists are saved so inference can rebuild the same codes
+    categories = {col: data[col].cat.categories.tolist() for col in categorical_features}
+    
+    # Prepare data as float32 (columns in feature_columns order); ages, day counts and
+    # category codes are exact in float32, and half the width of float64. Column-major, so
+    # each feature is one contiguous block, both when filled here and when binned for fitting
+    X = np.empty((len(data), len(feature_columns)), dtype=np.float32, order='F')
+    for j, col in enumerate(feature_columns):
+        X[:, j] = data[col].cat.codes if col in categories else data[col]
+    y = data[target_columns].to_numpy(dtype=np.float32)
+    return X, y, categories
+
+def _fit_lightgbm_models(X_train, y_train, target_columns, categorical_mask):
+    """Train one LightGBM booster per target, all sharing a single binned Dataset."""
+    params = {
+        'objective': 'regression',
+        # Tree size bounds: these set the number of nodes, and so the size of the saved model
+        'num_leaves': 31,
+        'max_depth': 12,
+        'min_child_samples': 20,
+        'num_threads': os.cpu_count() or 1,
+        'seed': 42,
+        'verbose': -1
+    }
+    categorical_idx = [j for j, is_categorical in enumerate(categorical_mask) if is_categorical]
+    
+    # Features are binned once when the Dataset is constructed; only the label changes per target
+    dataset = lgb.Dataset(X_train, label=np.ascontiguousarray(y_train[:, 0]), params=params,
+                          categorical_feature=categorical_idx, free_raw_data=True)
+    dataset.construct()
+    
+    models = {}
+    for k, target in enumerate(target_columns):
+        dataset.set_label(np.ascontiguousarray(y_train[:, k]))
+        models[target] = lgb.train(params, dataset, num_boost_round=200)
+    return models
+
+def _fit_hist_gradient_boosting(X_train, y_target, categorical_mask):
+    """Train one scikit-learn histogram gradient boosting model for a single target."""
+    model = HistGradientBoostingRegressor(
+        max_iter=200,
+        max_depth=8,
+        learning_rate=0.05,
+        early_stopping=True,
+        n_iter_no_change=10,
+        categorical_features=categorical_mask,
+        random_state=42
+    )
+    return model.fit(X_train, y_target)
+
+def _fit_hist_gradient_boosting_models(X_train, y_train, target_columns, categorical_mask):
+    """Train one scikit-learn model per target, fitting the targets in parallel."""
+    # The targets are independent, so each one is fitted in its own thread; the fits release
+    # the GIL and share X_train without pickling, and the CPUs are split between their
+    # OpenMP thread pools
+    cpu_count = os.cpu_count() or 1
+    n_jobs = min(len(target_columns), cpu_count)
+    with threadpool_limits(limits=max(1, cpu_count // n_jobs), user_api='openmp'):
+        fitted = joblib.Parallel(n_jobs=n_jobs, backend='threading')(
+            joblib.delayed(_fit_hist_gradient_boosting)(X_train, y_train[:, k], categorical_mask)
+            for k in range(len(target_columns))
+        )
+    return dict(zip(target_columns, fitted))
+
+def _export_onnx(models, target_columns, n_features, path):
+    """Save the per-target LightGBM boosters as one ONNX graph with an (n_rows, n_targets) output."""
+    graphs = []
+    for target in target_columns:
+        converted = convert_lightgbm(
+            models[target], initial_types=[('input', FloatTensorType([None, n_features]))],
+            target_opset=15, zipmap=False
+        )
+        # Prefix the names inside each graph so the graphs can share one input without clashes
+        graphs.append(compose.add_prefix(converted, prefix=f'{target}_', rename_inputs=False))
+    
+    nodes = [node for graph in graphs for node in graph.graph.node]
+    nodes.append(helper.make_node('Concat', [graph.graph.output[0].name for graph in graphs],
+                                  ['predictions'], axis=1))
+    merged = helper.make_graph(
+        nodes, 'workout_planner', [graphs[0].graph.input[0]],
+        [helper.make_tensor_value_info('predictions', TensorProto.FLOAT, [None, len(graphs)])],
+        [initializer for graph in graphs for initializer in graph.graph.initializer]
+    )
+    save_onnx(helper.make_model(merged, opset_imports=graphs[0].opset_import,
+                                ir_version=graphs[0].ir_version), path)
+
 def train_comprehensive_model():
     """Train the comprehensive fitness model."""
     
     print("🤖 Training AI Fitness Planner Model...")
     print("=" * 50)
     
-    # Load data
-    print("📊 Loading training data...")
-    data = pd.read_csv('data/workout_comprehensive.csv')
-    print(f"   Dataset size: {len(data):,} records")
-    
     # Define features and targets
     feature_columns = [
         'age', 'gender', 'goal', 'experience', 'training_days',
@@ -49,86 +189,105 @@ def train_comprehensive_model():
     ]
     target_columns = ['sets', 'reps', 'intensity', 'weight', 'rpe']
     
-    # Prepare data
-    X = data[feature_columns]
-    y = data[target_columns]
-    
     # Identify categorical and numerical features
     categorical_features = ['gender', 'goal', 'experience', 'location', 
                           'body_type', 'muscle_group', 'equipment', 'bodypart']
     numerical_features = ['age', 'training_days']
     
-    # Create preprocessing pipeline
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', StandardScaler(), numerical_features),
-            ('cat', OneHotEncoder(drop='first', sparse_output=False), categorical_features)
-        ]
+    # Training rows are capped per (goal, experience, muscle_group, equipment) combination
+    stratum_columns = ['goal', 'experience', 'muscle_group', 'equipment']
+    max_rows_per_stratum = 500
+    
+    # Load and encode data
+    print("📊 Loading training data...")
+    X, y, categories = _prepare_training_data(
+        'data/workout_comprehensive.csv', feature_columns, target_columns, categorical_features,
+        stratum_columns, max_rows_per_stratum
     )
+    print(f"   Dataset size: {len(X):,} records")
+    
+    categorical_mask = [col in categories for col in feature_columns]
     
-    # Create full pipeline with Random Forest
-    model = Pipeline([
-        ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(
-            n_estimators=100,
-            max_depth=15,
-            min_samples_split=10,
-            random_state=42,
-            n_jobs=-1
-        ))
-    ])
-    
-    # Split data
+    # Split data; only the int32 row indices are shuffled, then the arrays are gathered once
     print("🔄 Splitting data (80% train, 20% test)...")
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+    train_idx, test_idx = train_test_split(
+        np.arange(len(X), dtype=np.int32), test_size=0.2, random_state=42
     )
+    # Row gathers come back row-major; the training matrix is laid out column-major again
+    X_train, X_test = np.asfortranarray(X[train_idx]), X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
+    n_train, n_test = len(train_idx), len(test_idx)
     
-    print(f"   Training samples: {len(X_train):,}")
-    print(f"   Test samples: {len(X_test):,}")
+    print(f"   Training samples: {n_train:,}")
+    print(f"   Test samples: {n_test:,}")
     
-    # Train model
-    print("🧠 Training Random Forest model...")
-    print("   This may take several minutes...")
-    model.fit(X_train, y_train)
+    # Train one gradient boosting model per target
+    if lgb is not None:
+        model_type = 'lightgbm'
+        print("🧠 Training LightGBM models...")
+        models = _fit_lightgbm_models(X_train, y_train, target_columns, categorical_mask)
+    else:
+        model_type = 'hist_gradient_boosting'
+        print("🧠 Training gradient boosting models...")
+        models = _fit_hist_gradient_boosting_models(X_train, y_train, target_columns, categorical_mask)
     
     # Evaluate model
     print("📈 Evaluating model performance...")
-    y_pred = model.predict(X_test)
+    y_pred = np.column_stack([models[target].predict(X_test) for target in target_columns])
     
-    # Calculate R² scores for each target
-    r2_scores = {}
-    for i, target in enumerate(target_columns):
-        r2 = r2_score(y_test.iloc[:, i], y_pred[:, i])
-        r2_scores[target] = r2
+    # Calculate R² scores for all targets in one call
+    r2_values = r2_score(y_test, y_pred, multioutput='raw_values')
+    r2_scores = dict(zip(target_columns, r2_values.tolist()))
+    for target, r2 in r2_scores.items():
         print(f"   {target.upper()}: R² = {r2:.4f} ({r2*100:.1f}%)")
     
-    avg_r2 = np.mean(list(r2_scores.values()))
+    avg_r2 = float(r2_values.mean())
     print(f"   AVERAGE R²: {avg_r2:.4f} ({avg_r2*100:.1f}%)")
     
     # Save model
     print("💾 Saving model...")
     os.makedirs('model', exist_ok=True)
-    joblib.dump(model, 'model/comprehensive_model.pkl')
+    # lz4 decompresses much faster than zlib when the server loads the model
+    compress = ('lz4', 3) if lz4 is not None else 3
+    joblib.dump(models, 'model/comprehensive_model.pkl', compress=compress)
+    
+    # ONNX copy of the models for onnxruntime inference at serving time
+    onnx_path = 'model/comprehensive_model.onnx'
+    onnx_exported = model_type == 'lightgbm' and convert_lightgbm is not None
+    if onnx_exported:
+        _export_onnx(models, target_columns, len(feature_columns), onnx_path)
+    elif os.path.exists(onnx_path):
+        # An export from an earlier run would not match the new models
+        os.remove(onnx_path)
     
     # Save model info
     model_info = {
+        'model_type': model_type,
         'feature_columns': feature_columns,
         'target_columns': target_columns,
         'categorical_features': categorical_features,
         'numerical_features': numerical_features,
+        'categories': categories,
+        'onnx_model': onnx_exported,
         'r2_scores': r2_scores,
         'average_r2': avg_r2,
-        'training_samples': len(X_train),
-        'test_samples': len(X_test)
+        'training_samples': n_train,
+        'test_samples': n_test
     }
     
-    with open('model/model_info.json', 'w') as f:
-        json.dump(model_info, f, indent=2)
+    if orjson is not None:
+        with open('model/model_info.json', 'wb') as f:
+            f.write(orjson.dumps(model_info, option=orjson.OPT_INDENT_2))
+    else:
+        with open('model/model_info.json', 'w') as f:
+            json.dump(model_info, f, indent=2)
     
     # Check model size
     model_size = os.path.getsize('model/comprehensive_model.pkl') / (1024 * 1024)
     print(f"   Model saved: comprehensive_model.pkl ({model_size:.1f} MB)")
+    if onnx_exported:
+        onnx_size = os.path.getsize(onnx_path) / (1024 * 1024)
+        print(f"   ONNX model saved: comprehensive_model.onnx ({onnx_size:.1f} MB)")
     print(f"   Info saved: model_info.json")
     
     print("\n✅ Model training completed successfully!")